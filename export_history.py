@@ -0,0 +1,321 @@
+"""
+Channel History Export
+
+Command line entry point for dumping whole channel histories, or date ranges of them, for
+offline analysis. Messages are streamed page by page through the same paging used by the bot
+and written in bounded-size part files as compressed JSONL or Parquet.
+
+Each channel gets its own directory containing the part files and a _state.json file. The
+state is updated after every part file, so an interrupted export resumes from the last
+exported message id, and a finished export only picks up newer messages on the next run.
+The state belongs to the output directory, so use a separate one per date range.
+
+The exporter logs in with its own session file (--session, "export_session" by default) so it
+can run next to the bot without both processes locking the bot's user_session database. The
+first run asks for the login code once, like the bot's first start.
+
+The command exits with status 1 if any channel failed, so scheduled exports can detect it.
+
+Usage:
+    python export_history.py @channel1 @channel2 --format parquet --output-dir exports
+    python export_history.py @channel --from-date 2023-01-01 --to-date 2023-01-31
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from get_telegram_client import create_user_client
+from main import iter_history
+
+# Load environment variables from .env file
+load_dotenv()
+
+PHONE_NUMBER = os.getenv('PHONE_NUMBER')
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_state.json"
+
+# Longest flood wait the export client sleeps through before giving up on a channel
+FLOOD_SLEEP_THRESHOLD = 24 * 60 * 60
+
+# Column layout shared by every Parquet part file so they can be read as one dataset
+PARQUET_COLUMNS = [
+    ("id", "int64"),
+    ("channel", "string"),
+    ("date", "timestamp"),
+    ("sender_id", "int64"),
+    ("message", "string"),
+    ("views", "int64"),
+    ("forwards", "int64"),
+    ("reply_to_msg_id", "int64"),
+]
+
+
+def message_to_record(message, channel: str) -> Dict[str, Any]:
+    """
+    Converts a Telegram message into a flat, serialisable record.
+
+    Args:
+        message: The Telethon message object
+        channel: The channel username the message came from
+
+    Returns:
+        A dictionary with one key per exported column
+    """
+    return {
+        "id": message.id,
+        "channel": channel,
+        "date": message.date,
+        # Channel posts have no sender, keep them as null rather than a placeholder
+        "sender_id": getattr(message.from_id, 'user_id', None) if message.from_id else None,
+        "message": message.message,
+        "views": message.views,
+        "forwards": message.forwards,
+        # Story replies use MessageReplyStoryHeader, which has no message id
+        "reply_to_msg_id": getattr(message.reply_to, 'reply_to_msg_id', None),
+    }
+
+
+def write_jsonl(records: List[Dict[str, Any]], path: str):
+    """Writes records as gzip-compressed JSON lines"""
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps({**record, "date": record["date"].isoformat()}, ensure_ascii=False))
+            f.write("\n")
+
+
+def write_parquet(records: List[Dict[str, Any]], path: str):
+    """Writes records as a Parquet file with the shared column layout"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int64": pa.int64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("s", tz="UTC"),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in PARQUET_COLUMNS])
+    table = pa.Table.from_pylist(records, schema=schema)
+    pq.write_table(table, path, compression="zstd")
+
+
+WRITERS = {
+    "jsonl": (".jsonl.gz", write_jsonl),
+    "parquet": (".parquet", write_parquet),
+}
+
+
+def load_state(channel_dir: str) -> Dict[str, int]:
+    """
+    Loads the export progress of a channel.
+
+    The state holds:
+        - min_id: Newest message id covered by the last completed export
+        - offset_id: Oldest message id written by an unfinished export (0 if none)
+        - run_max_id: Newest message id seen by the unfinished export
+    """
+    path = os.path.join(channel_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"min_id": 0, "offset_id": 0, "run_max_id": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(channel_dir: str, state: Dict[str, int]):
+    """Atomically replaces the channel's state file"""
+    path = os.path.join(channel_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def flush_batch(records: List[Dict[str, Any]], channel_dir: str, fmt: str, state: Dict[str, int]):
+    """
+    Writes a batch to its own part file and records the progress.
+
+    The part file is written under a temporary name and renamed, so a crash never leaves a
+    truncated file behind and the state never points past data that is not on disk.
+    """
+    extension, writer = WRITERS[fmt]
+    # Records arrive newest first, so the name reads oldest-newest for the covered id range
+    path = os.path.join(channel_dir, f"part-{records[-1]['id']:012d}-{records[0]['id']:012d}{extension}")
+    writer(records, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+    state["offset_id"] = records[-1]["id"]
+    state["run_max_id"] = max(state["run_max_id"], records[0]["id"])
+    save_state(channel_dir, state)
+
+
+async def export_channel(client, channel: str, output_dir: str, fmt: str, batch_size: int,
+                         from_date: Optional[datetime] = None, to_date: Optional[datetime] = None,
+                         progress: Optional[Dict[str, int]] = None):
+    """
+    Exports the history of a single channel into part files.
+
+    Args:
+        client: The connected Telethon user client
+        channel: The channel username
+        output_dir: Directory holding one sub-directory per channel
+        fmt: Output format, "jsonl" or "parquet"
+        batch_size: Maximum number of messages per part file, and held in memory at once
+        from_date: Only export messages on or after this date
+        to_date: Only export messages on or before this date
+        progress: Optional dictionary whose "exported" count is kept up to date, so callers
+            can still report what was written if the export fails part way
+
+    Returns:
+        The number of messages exported in this run
+    """
+    channel_dir = os.path.join(output_dir, channel.lstrip('@'))
+    os.makedirs(channel_dir, exist_ok=True)
+
+    state = load_state(channel_dir)
+    if state["offset_id"]:
+        logger.info(f"{channel}: resuming below message id {state['offset_id']}")
+
+    if progress is None:
+        progress = {}
+    progress["exported"] = 0
+
+    chat = await client.get_entity(channel)
+
+    batch = []
+    done = False
+
+    async for messages in iter_history(chat, from_date=from_date, to_date=to_date,
+                                       offset_id=state["offset_id"], min_id=state["min_id"],
+                                       client=client):
+        for message in messages:
+            if from_date and message.date < from_date:
+                done = True
+                break
+            if to_date and message.date > to_date:
+                continue
+            # Service messages (joins, pins, ...) carry no content to analyse
+            if getattr(message, 'message', None) is None:
+                continue
+
+            batch.append(message_to_record(message, channel))
+
+            if len(batch) >= batch_size:
+                flush_batch(batch, channel_dir, fmt, state)
+                progress["exported"] += len(batch)
+                logger.info(f"{channel}: exported {progress['exported']} messages so far")
+                batch = []
+
+        if done:
+            break
+
+    if batch:
+        flush_batch(batch, channel_dir, fmt, state)
+        progress["exported"] += len(batch)
+
+    # The whole range down to min_id is covered, the next run only needs newer messages
+    state = {"min_id": max(state["min_id"], state["run_max_id"]), "offset_id": 0, "run_max_id": 0}
+    save_state(channel_dir, state)
+
+    logger.info(f"{channel}: finished, {progress['exported']} messages exported")
+    return progress["exported"]
+
+
+async def export_channels(channels: List[str], output_dir: str, fmt: str, batch_size: int,
+                          concurrency: int, session: str, from_date: Optional[datetime] = None,
+                          to_date: Optional[datetime] = None) -> List[str]:
+    """
+    Exports several channels concurrently, at most `concurrency` at a time.
+
+    Returns:
+        The channels whose export failed
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def run(channel):
+        progress = {"exported": 0}
+        async with semaphore:
+            try:
+                await export_channel(client, channel, output_dir, fmt, batch_size,
+                                     from_date, to_date, progress)
+            except Exception as e:
+                # Part files already written stay valid and the state lets the next run resume
+                logger.error(f"{channel}: export failed after {progress['exported']} messages: {e}")
+                failed.append(channel)
+
+    client = create_user_client(session)
+    # Long exports routinely hit flood waits beyond Telethon's 60 second default; sleep through
+    # them instead of failing the channel
+    client.flood_sleep_threshold = FLOOD_SLEEP_THRESHOLD
+    await client.start(PHONE_NUMBER)
+    try:
+        await asyncio.gather(*(run(channel) for channel in channels))
+    finally:
+        await client.disconnect()
+    return failed
+
+
+def parse_date(value: str) -> datetime:
+    """Parses a YYYY-MM-DD argument as a UTC date"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', use YYYY-MM-DD format")
+
+
+def positive_int(value: str) -> int:
+    """Parses an integer argument that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Must be at least 1, got {number}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Telegram channel history for offline analysis")
+    parser.add_argument("channels", nargs="+", help="Channel usernames, e.g. @durov")
+    parser.add_argument("--output-dir", default="exports", help="Directory for the exported files")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl", help="Output file format")
+    parser.add_argument("--from-date", type=parse_date, help="Only export messages on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--to-date", type=parse_date, help="Only export messages on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=positive_int, default=5000, help="Maximum messages per part file")
+    parser.add_argument("--concurrency", type=positive_int, default=3, help="Channels exported at the same time")
+    parser.add_argument("--session", default="export_session",
+                        help="Telethon session name, kept separate from the bot's user_session")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet export requires pyarrow: pip install pyarrow")
+
+    # Usernames are case-insensitive, and two tasks on one channel directory would race on its state
+    channels = list(dict.fromkeys('@' + c.lstrip('@').lower() for c in args.channels))
+
+    to_date = args.to_date
+    if to_date:
+        # Ensure to_date is end of day
+        to_date = to_date.replace(hour=23, minute=59, second=59)
+
+    failed = asyncio.run(export_channels(channels, args.output_dir, args.format, args.batch_size,
+                                         args.concurrency, args.session, args.from_date, to_date))
+    if failed:
+        logger.error(f"Export failed for {len(failed)} of {len(channels)} channels: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from telethon import TelegramClient
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,6 +19,7 @@ class TelegramClientSingleton:
         if cls._bot_instance is None:
             if not all([API_ID, API_HASH, BOT_TOKEN]):
                 raise ValueError("Bot credentials not found in environment variables")
+            from telethon import TelegramClient
             cls._bot_instance = TelegramClient('bot_session', API_ID, API_HASH)
         return cls._bot_instance
     
@@ -28,6 +28,7 @@ class TelegramClientSingleton:
         if cls._user_instance is None:
             if not all([API_ID, API_HASH]):
                 raise ValueError("User client credentials not found in environment variables")
+            from telethon import TelegramClient
             cls._user_instance = TelegramClient('user_session', API_ID, API_HASH)
         return cls._user_instance
 
@@ -37,4 +38,11 @@ def get_bot():
 
 # Convenient function to get user client
 def get_user_client():
-    return TelegramClientSingleton.get_user_client()
\ No newline at end of file
+    return TelegramClientSingleton.get_user_client()
+
+# Build a separate user client on its own session file, for tools that run next to the bot
+def create_user_client(session_name):
+    if not all([API_ID, API_HASH]):
+        raise ValueError("User client credentials not found in environment variables")
+    from telethon import TelegramClient
+    return TelegramClient(session_name, API_ID, API_HASH)
@@ -1,12 +1,9 @@
 import re
-from telethon import TelegramClient, events
-from telethon.tl.functions.messages import GetHistoryRequest
 import os
 import logging
 import asyncio
 from dotenv import load_dotenv
-from datetime import datetime, timezone
-from rag import create_rag_graph  # Import RAG functionality
+from datetime import datetime, timezone, timedelta
 from get_telegram_client import get_bot, get_user_client  # Import client factory functions
 # from tools.get_telegram_username import get_telegram_username
 # Load environment variables from .env file
@@ -15,9 +12,6 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 PHONE_NUMBER = os.getenv('PHONE_NUMBER')
 
-bot = get_bot()
-user_client = get_user_client()
-
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,6 +19,54 @@ logger = logging.getLogger(__name__)
 # Get the bot username for use in group chats
 BOT_USERNAME = None
 
+# Compiled RAG graph, built on first use so LangGraph and langchain-anthropic stay out of startup
+_rag_graph = None
+
+def get_rag_graph():
+    """Import the RAG stack and compile the graph on first use"""
+    global _rag_graph
+    if _rag_graph is None:
+        from rag import create_rag_graph
+        _rag_graph = create_rag_graph()
+    return _rag_graph
+
+# Conversation sessions keyed by (chat_id, channel). The fetched context is kept fixed
+# across follow-up questions so the system prompt and context can be served from the
+# provider's prompt cache. Sessions expire together with the cache (5 minutes idle), and
+# after SESSION_MAX_AGE regardless of activity so answers never drift far from the channel.
+SESSION_TTL = timedelta(minutes=5)
+SESSION_MAX_AGE = timedelta(minutes=30)
+MAX_SESSION_TURNS = 10
+conversation_sessions = {}
+
+def is_session_expired(session, now):
+    """Check whether a session has been idle too long or outlived its maximum age"""
+    return now - session["last_used"] > SESSION_TTL or now - session["created_at"] > SESSION_MAX_AGE
+
+def prune_conversation_sessions():
+    """Drop every expired session so one-off questions don't keep their context in memory"""
+    now = datetime.now(timezone.utc)
+    for key in [key for key, session in conversation_sessions.items() if is_session_expired(session, now)]:
+        del conversation_sessions[key]
+
+def get_conversation_session(chat_id, channel_name):
+    """Return the live session for this chat and channel, or None if missing or expired"""
+    prune_conversation_sessions()
+    return conversation_sessions.get((chat_id, channel_name.lower()))
+
+def start_conversation_session(chat_id, channel_name, raw_messages):
+    """Create a session holding the fetched context for follow-up questions"""
+    prune_conversation_sessions()
+    now = datetime.now(timezone.utc)
+    session = {
+        "retrieved_documents": raw_messages,
+        "history": [],
+        "created_at": now,
+        "last_used": now,
+    }
+    conversation_sessions[(chat_id, channel_name.lower())] = session
+    return session
+
 async def get_bot_info():
     """Get the bot's username to handle group commands"""
     global BOT_USERNAME
@@ -34,6 +76,56 @@ async def get_bot_info():
         BOT_USERNAME = me.username
         logger.info(f"Bot username: @{BOT_USERNAME}")
 
+async def iter_history(chat, from_date=None, to_date=None, offset_id=0, min_id=0, client=None):
+    """
+    Page through a chat's history from newest to oldest using the user client
+    
+    Args:
+        chat: The resolved channel entity
+        from_date: Stop once a page reaches messages older than this date
+        to_date: Start paging from this date instead of the newest message
+        offset_id: Only return messages older than this message id (0 for no bound)
+        min_id: Only return messages newer than this message id (0 for no bound)
+        client: The Telethon client to page with (defaults to the shared user client)
+        
+    Yields:
+        Lists of up to 100 messages, newest first
+    """
+    from telethon.tl.functions.messages import GetHistoryRequest
+
+    user_client = client or get_user_client()
+    limit_per_request = 100  # Telegram API limitation
+
+    while True:
+        # Retrieve messages using the user client
+        history = await user_client(GetHistoryRequest(
+            peer=chat,
+            limit=limit_per_request,
+            offset_date=to_date,
+            offset_id=offset_id,
+            max_id=0,
+            min_id=min_id,
+            add_offset=0,
+            hash=0
+        ))
+
+        if not history.messages:
+            break
+            
+        messages = history.messages
+        yield messages
+
+        # Update offset for next iteration
+        offset_id = messages[-1].id
+            
+        # If we've gone past the from_date, we can stop
+        if from_date and messages[-1].date < from_date:
+            break
+            
+        # Also stop if we got fewer messages than requested (end of history)
+        if len(messages) < limit_per_request:
+            break
+
 async def fetch_messages_with_user(channel_username, limit=20, from_date=None, to_date=None, for_rag=False):
     """
     Fetch messages from a specific channel using the user client
@@ -46,6 +138,8 @@ async def fetch_messages_with_user(channel_username, limit=20, from_date=None, t
         for_rag: Whether to return raw messages for RAG processing
     """
     try:
+        user_client = get_user_client()
+
         # Make sure the user client is connected
         if not user_client.is_connected():
             await user_client.connect()
@@ -55,30 +149,13 @@ async def fetch_messages_with_user(channel_username, limit=20, from_date=None, t
         
         # Initialize variables for message retrieval
         all_messages = []
-        offset_id = 0
-        limit_per_request = 100  # Telegram API limitation
         total_messages = 0
         date_filter_active = from_date is not None
         
         # If using date filtering, we need to continue fetching until we've covered the date range
-        while True:
-            # Retrieve messages using the user client
-            history = await user_client(GetHistoryRequest(
-                peer=chat,
-                limit=limit_per_request,
-                offset_date=to_date if date_filter_active else None,
-                offset_id=offset_id,
-                max_id=0,
-                min_id=0,
-                add_offset=0,
-                hash=0
-            ))
-
-            if not history.messages:
-                break
-                
-            messages = history.messages
-            
+        async for messages in iter_history(chat,
+                                           from_date=from_date if date_filter_active else None,
+                                           to_date=to_date if date_filter_active else None):
             for message in messages:
                 # Apply date filtering if active
                 if date_filter_active:
@@ -94,21 +171,10 @@ async def fetch_messages_with_user(channel_username, limit=20, from_date=None, t
                     all_messages.append(message)
                     total_messages += 1
             
-            # Update offset for next iteration
-            offset_id = messages[-1].id
-            
             # Stop if we've reached the requested limit in count mode
             if not date_filter_active and total_messages >= limit:
                 all_messages = all_messages[:limit]  # Trim to exactly the requested limit
                 break
-                
-            # If we're in date mode and we've gone past the from_date, we can stop
-            if date_filter_active and from_date and messages[-1].date < from_date:
-                break
-                
-            # Also stop if we got fewer messages than requested (end of history)
-            if len(messages) < limit_per_request:
-                break
 
         # Format messages based on whether they're for RAG or display
         if for_rag:
@@ -140,7 +206,6 @@ async def fetch_messages_with_user(channel_username, limit=20, from_date=None, t
         logger.error(f"Error fetching messages: {e}")
         return f"Error fetching messages: {e}" if not for_rag else []
 
-@bot.on(events.NewMessage(pattern='/start'))
 async def start_handler(event):
     """Handle the /start command"""
     # Only respond in private chats or if the bot is mentioned in groups
@@ -159,7 +224,6 @@ async def start_handler(event):
                         "Example for count: /rag @durov count 20 What are Pavel's thoughts on AI?\n"
                         "Example for date: /rag @durov date 2023-01-01 2023-01-31 What topics were discussed?")
 
-@bot.on(events.NewMessage(pattern='/fetch'))
 async def fetch_handler(event):
     """Handle the /fetch command"""
     try:
@@ -250,7 +314,6 @@ async def fetch_handler(event):
         logger.error(f"Error in fetch handler: {e}")
         await event.respond(f"Error: {str(e)}")
 
-@bot.on(events.NewMessage(pattern=r'^@'))
 async def rag_handler(event):
     """Handle messages in the format @<channel_name> [prompt]"""
     try:
@@ -264,26 +327,45 @@ async def rag_handler(event):
         channel_name = args[0]
         prompt = " ".join(args[1:])
     
-        limit = 100  # Cap at 100 to avoid large responses
-        
-        await event.respond(f"Fetching up to {limit} messages from {channel_name} and processing your query: '{prompt}'...")
-        
-        # Fetch raw messages for RAG
-        raw_messages = await fetch_messages_with_user(channel_name, limit=100, for_rag=True)
+        session = get_conversation_session(event.chat_id, channel_name)
+
+        if session is None:
+            limit = 100  # Cap at 100 to avoid large responses
             
-        # Check if we have any messages to process
-        if not raw_messages:
-            await event.respond("No messages found to process with RAG.")
-            return
+            await event.respond(f"Fetching up to {limit} messages from {channel_name} and processing your query: '{prompt}'...")
+            
+            # Fetch raw messages for RAG
+            raw_messages = await fetch_messages_with_user(channel_name, limit=limit, for_rag=True)
+                
+            # Check if we have any messages to process
+            if not raw_messages:
+                await event.respond("No messages found to process with RAG.")
+                return
+
+            session = start_conversation_session(event.chat_id, channel_name, raw_messages)
+        else:
+            await event.respond(f"Using the messages already fetched from {channel_name} to answer: '{prompt}'...")
             
         # Process the messages with RAG
         await event.respond("Processing your query with RAG. Please wait...")
 
-        rag_graph = create_rag_graph()
-        rag_response = rag_graph.invoke({"retrieved_documents": raw_messages, "query": prompt})
+        rag_graph = get_rag_graph()
+        rag_response = rag_graph.invoke({
+            "retrieved_documents": session["retrieved_documents"],
+            "history": session["history"],
+            "query": prompt
+        })
 
         output_response = rag_response["response"]
 
+        # Record the turn so the next question continues the same conversation
+        session["history"].extend([
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": output_response},
+        ])
+        session["history"] = session["history"][-2 * MAX_SESSION_TURNS:]
+        session["last_used"] = datetime.now(timezone.utc)
+
         # Send the RAG response
         await event.respond(f"RAG Response for query '{prompt}':\n\n{output_response}")
 
@@ -291,7 +373,6 @@ async def rag_handler(event):
         logger.error(f"Error in RAG handler: {e}")
         await event.respond(f"Error processing with RAG: {str(e)}")
 
-@bot.on(events.NewMessage(pattern='/rag'))
 async def rag_handler_old(event):
     """Handle the /rag command to fetch messages and process them with RAG"""
     try:
@@ -392,7 +473,7 @@ async def rag_handler_old(event):
         # Process the messages with RAG
         await event.respond("Processing your query with RAG. Please wait...")
 
-        rag_graph = create_rag_graph()
+        rag_graph = get_rag_graph()
         rag_response = rag_graph.invoke({"retrieved_documents": raw_messages, "query": query})
 
         output_response = rag_response["response"]
@@ -404,7 +485,39 @@ async def rag_handler_old(event):
         logger.error(f"Error in RAG handler: {e}")
         await event.respond(f"Error processing with RAG: {str(e)}")
 
+# Clients returned by create_app, kept so handlers are only registered once per process
+_app = None
+
+def create_app():
+    """
+    Construct the Telegram clients and register the bot's command handlers.
+    
+    The clients are process-wide singletons, so repeated calls return the same pair
+    instead of registering every handler again.
+    
+    Returns:
+        A (bot, user_client) tuple, not yet started.
+    """
+    global _app
+    if _app is not None:
+        return _app
+
+    from telethon import events
+
+    bot = get_bot()
+    user_client = get_user_client()
+
+    bot.add_event_handler(start_handler, events.NewMessage(pattern='/start'))
+    bot.add_event_handler(fetch_handler, events.NewMessage(pattern='/fetch'))
+    bot.add_event_handler(rag_handler, events.NewMessage(pattern=r'^@'))
+    bot.add_event_handler(rag_handler_old, events.NewMessage(pattern='/rag'))
+
+    _app = (bot, user_client)
+    return _app
+
 async def main():
+    bot, user_client = create_app()
+
     # Start both clients
     await bot.start(bot_token=BOT_TOKEN)
     await user_client.start(PHONE_NUMBER)
@@ -11,7 +11,7 @@ from typing import Dict, Any, List, TypedDict, Optional
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langchain_anthropic import ChatAnthropic
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 # Load environment variables
 load_dotenv()
@@ -20,8 +20,39 @@ load_dotenv()
 class GraphState(TypedDict):
     query: str
     retrieved_documents: List[str]
+    history: List[Dict[str, str]]
     response: Optional[str]
 
+# Stable instructions sent as the first system block so they can be served from the prompt cache
+SYSTEM_PROMPT = """You are a helpful assistant answering questions based on the provided information.
+
+Please provide a helpful, accurate, and concise answer based only on the context provided.
+If the context doesn't contain relevant information to answer the question, say so rather than making up information.
+
+Make your response more engaging by using appropriate emojis. For example:
+- Use 💡 when sharing insights or key information
+- Use ✅ when confirming something is correct or available
+- Use ❌ when information is not found or unavailable
+- Use 📊 when presenting data or statistics
+- Use 🔍 when referencing search results
+- Use 📝 when providing summaries
+
+Start your response with a relevant emoji that sets the tone for your answer.
+Use section headings with emojis where appropriate to organize longer responses.
+
+Also incorporate emojis naturally within your text, especially when:
+- Expressing emotions (happy 😊, sad 😢, surprised 😲, etc.)
+- Describing actions (reading 📚, writing ✍️, searching 🔎)
+- Emphasizing important points ⚠️
+- Mentioning specific topics (money 💰, time ⏰, technology 💻)
+- Expressing agreement 👍 or disagreement 👎
+- Creating visual cues that enhance readability and engagement
+
+Balance emoji usage to enhance clarity, not distract from your message.
+
+IMPORTANT: Detect the language of the user's query and respond in the same language. If the query is in English, respond in English. If the query is in Spanish, respond in Spanish, and so on. Match the language of your response to the language used in the query.
+"""
+
 
 def generate_response(state: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -31,6 +62,7 @@ def generate_response(state: Dict[str, Any]) -> Dict[str, Any]:
         state: The graph state containing:
             - retrieved_documents: List of document content strings
             - query: User's question
+            - history: Optional list of prior turns as {"role": "user"|"assistant", "content": str}
             
     Returns:
         Updated state with response field added
@@ -38,6 +70,7 @@ def generate_response(state: Dict[str, Any]) -> Dict[str, Any]:
 
     context = state.get("retrieved_documents", [])
     query = state.get("query", "")
+    history = state.get("history") or []
     
     model = ChatAnthropic(
         model="claude-3-7-sonnet-latest", 
@@ -45,51 +78,38 @@ def generate_response(state: Dict[str, Any]) -> Dict[str, Any]:
         temperature=0.3
     )
     
-    prompt = ChatPromptTemplate.from_template("""
-    You are a helpful assistant answering questions based on the provided information.
-    
-    Context information:
-    {context}
-    
-    User question: {query}
-    
-    Please provide a helpful, accurate, and concise answer based only on the context provided.
-    If the context doesn't contain relevant information to answer the question, say so rather than making up information.
-    
-    Make your response more engaging by using appropriate emojis. For example:
-    - Use 💡 when sharing insights or key information
-    - Use ✅ when confirming something is correct or available
-    - Use ❌ when information is not found or unavailable
-    - Use 📊 when presenting data or statistics
-    - Use 🔍 when referencing search results
-    - Use 📝 when providing summaries
-    
-    Start your response with a relevant emoji that sets the tone for your answer.
-    Use section headings with emojis where appropriate to organize longer responses.
-    
-    Also incorporate emojis naturally within your text, especially when:
-    - Expressing emotions (happy 😊, sad 😢, surprised 😲, etc.)
-    - Describing actions (reading 📚, writing ✍️, searching 🔎)
-    - Emphasizing important points ⚠️
-    - Mentioning specific topics (money 💰, time ⏰, technology 💻)
-    - Expressing agreement 👍 or disagreement 👎
-    - Creating visual cues that enhance readability and engagement
-    
-    Balance emoji usage to enhance clarity, not distract from your message.
-    
-    IMPORTANT: Detect the language of the user's query and respond in the same language. If the query is in English, respond in English. If the query is in Spanish, respond in Spanish, and so on. Match the language of your response to the language used in the query.
-    """)
-    
     if isinstance(context, list):
         context_text = "\n\n".join(context)
     else:
         context_text = str(context)
 
-    chain = prompt | model 
-    response = chain.invoke({
-        "context": context_text,
-        "query": query
-    })
+    # The instructions and the channel context never change within a session, so they go
+    # first and the cache breakpoint sits at the end of the context block. Follow-up turns
+    # then reuse the cached prefix and only the new conversation turns are processed.
+    messages = [
+        SystemMessage(content=[
+            {"type": "text", "text": SYSTEM_PROMPT},
+            {
+                "type": "text",
+                "text": f"Context information:\n{context_text}",
+                "cache_control": {"type": "ephemeral"},
+            },
+        ])
+    ]
+
+    for i, turn in enumerate(history):
+        content = turn["content"]
+        # Mark the most recent prior turn too, so the growing history is cached incrementally
+        if i == len(history) - 1:
+            content = [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+        if turn["role"] == "user":
+            messages.append(HumanMessage(content=content))
+        else:
+            messages.append(AIMessage(content=content))
+
+    messages.append(HumanMessage(content=query))
+
+    response = model.invoke(messages)
     response_text = response.content
     return {"response": response_text}
 
@@ -4,7 +4,7 @@ from setuptools import setup
 setup(
     name="telegram-bot",
     version="0.1.0",
-    py_modules=["main", "generate_session"],
+    py_modules=["main", "generate_session", "export_history", "get_telegram_client", "rag"],
     install_requires=[
         "python-dotenv>=1.0.1",
         "python-telegram-bot[job-queue]>=20.0",
@@ -0,0 +1,76 @@
+"""
+Startup Time Benchmark
+
+Measures how long a fresh interpreter takes to import the bot modules and build the app,
+so regressions in cold start (e.g. heavy imports creeping back to module scope) are easy to spot.
+
+Usage:
+    python tools/benchmark_startup.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each stage runs in its own interpreter so module caches never carry over between runs
+STAGES = {
+    "import main": "import main",
+    "create_app": "import main; main.create_app()",
+    "import rag": "import rag",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def time_stage(code: str) -> float:
+    """
+    Runs a snippet in a fresh interpreter and returns its wall time in seconds.
+
+    Args:
+        code: The Python statements to time
+
+    Returns:
+        The elapsed time reported by the child process
+
+    Raises:
+        RuntimeError: If the snippet fails in the child process
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        # A child killed by a signal may exit without writing anything to stderr
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exited with return code {result.returncode}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per stage")
+    args = parser.parse_args()
+
+    for name, code in STAGES.items():
+        try:
+            timings = [time_stage(code) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<12} failed: {e}")
+            continue
+        print(f"{name:<12} median {statistics.median(timings) * 1000:8.1f} ms, "
+              f"min {min(timings) * 1000:8.1f} ms over {args.runs} runs")
+
+
+if __name__ == '__main__':
+    main()
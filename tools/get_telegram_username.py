@@ -6,7 +6,6 @@ This module provides functionality to resolve a Telegram username from a user ID
 
 import os
 from typing import Optional
-from telethon import TelegramClient
 from dotenv import load_dotenv
 from get_telegram_client import get_user_client
 # Load environment variables